@@ -5,16 +5,47 @@ import re
 import pandas as pd
 import numpy as np
 import collections
+import difflib
+import unicodedata
 import dash_bootstrap_components as dbc
 import json
+import argparse
+import contextlib
+import functools
+import threading
+import statistics
+import time
+import uuid
+import tracemalloc
+import os
+import gzip
+import hashlib
+import mimetypes
+from flask import abort, request, send_file
+from werkzeug.security import safe_join
 
 from lxml import etree
 import base64
-from io import BytesIO, StringIO
+from io import BytesIO
 
 import pprint
 pp = pprint.PrettyPrinter(depth=4)
 
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import flask_compress
+except ImportError:
+    flask_compress = None
+
 contributor_roles = {
     'Conceptualization':['Ideas; formulation or evolution of overarching research goals and aims.', 'https://credit.niso.org/contributor-roles/conceptualization/'],
     'Data curation':['Management activities to annotate (produce metadata), scrub data and maintain research data (including software code, where it is necessary for interpreting the data itself) for initial use and later re-use.', 'https://credit.niso.org/contributor-roles/data-curation/'], 
@@ -36,9 +67,19 @@ df = pd.DataFrame.from_dict(contributor_roles, orient='index', columns=['Descrip
 df = df.reset_index().rename(columns={'index': 'Role'})
 df = df.drop(['URL'], axis=1)
 
+name_columns = ['First Name', 'Middle Name', 'Last Name', 'Initials']
+table_columns = ['Role'] + name_columns + list(contributor_roles)
+
+def normalize_role_name(name):
+    # Treat hyphen, en-dash, em-dash and minus variants as the same separator
+    name = re.sub(r'\s*[\u2010-\u2015\u2212-]\s*', ' - ', name)
+    return ' '.join(name.split()).lower()
+
+role_lookup = {normalize_role_name(role): role for role in contributor_roles}
+
 def extract_name_parts(name):
-    # Remove special characters and numbers
-    name = re.sub(r'[^a-zA-Z\s]', '', name)
+    # Remove special characters and numbers, keep accented letters
+    name = re.sub(r'[^\w\s]|[\d_]', '', name)
     # Split the name into parts
     parts = name.split()
     
@@ -68,8 +109,8 @@ def extract_name_parts(name):
         'credit_14': 0
     }
     
-def generate_unique_initials(authors_dict):
-    existing_initials = set()
+def generate_unique_initials(authors_dict, existing_initials=()):
+    existing_initials = set(existing_initials)
     
     def create_initials(author):
         first_name = author['first_name']
@@ -83,12 +124,15 @@ def generate_unique_initials(authors_dict):
         # Ensure initials are unique by appending characters from the surname
         unique_initials = initials
         if unique_initials:
+            extra = 1
+            number = len(existing_initials)
             while unique_initials in existing_initials:
-                if len(unique_initials) < 2 + len(surname):
-
-                    unique_initials = initials + surname[1].lower()  # Use 1 or more characters from surname
+                if extra < len(surname):
+                    unique_initials = initials + surname[1:extra + 1].lower()  # Use 1 or more characters from surname
+                    extra += 1
                 else:
-                    unique_initials = initials + str(len(existing_initials))
+                    unique_initials = initials + str(number)
+                    number += 1
                 
         existing_initials.add(unique_initials)
         return unique_initials
@@ -97,7 +141,14 @@ def generate_unique_initials(authors_dict):
         unique_initials = create_initials(author)
         author['initials'] = unique_initials
 
-def generate_table(dataframe):
+def progress_range(total, set_progress, start, end, label):
+    # Count 0..total-1 and move the progress bar from start to end every 500 authors
+    for i in range(total):
+        if i % 500 == 0:
+            set_progress((start + (end - start) * i // total, f'{label}: {i} of {total} authors'))
+        yield i
+
+def generate_table(dataframe, set_progress=lambda progress: None):
     return html.Table(className="table table-header-rotated", children=[
         html.Thead(children=[
             html.Tr(children=[
@@ -130,7 +181,7 @@ def generate_table(dataframe):
                         className='centered-item'
                     )]) for col in dataframe.columns[5:]
                 ]
-            ) for i in range(len(dataframe))
+            ) for i in progress_range(len(dataframe), set_progress, 60, 100, 'Building the table')
         ])
     ])
 
@@ -138,26 +189,138 @@ def generate_id(string):
     new = string.lower().replace(' & ', '_').replace(' – ', '_').replace(' ', '_')
     return new
 
-def parse_contents(contents, filename):
+def load_json_records(authors):
+    # Accept either a plain list of authors or a manuscript object {"id": ..., "authors": [...]}
+    if isinstance(authors, dict):
+        authors = authors.get('authors')
+    if not isinstance(authors, list):
+        raise ValueError('expected a list of authors')
+    if not authors:
+        raise ValueError('the list of authors is empty')
+
+    records = []
+    for i, author in enumerate(authors, start=1):
+        if not isinstance(author, dict):
+            raise ValueError(f'author {i} is not an object')
+
+        record = {'Role': i}
+        record.update({col: '' for col in name_columns})
+        record.update({role: False for role in contributor_roles})
+
+        for key, value in author.items():
+            if key == 'Role':
+                continue
+            if key in name_columns:
+                record[key] = '' if value is None else str(value)
+                continue
+            role = role_lookup.get(normalize_role_name(key))
+            if role is None:
+                raise ValueError(f'author {i}: unknown column "{key}"')
+            # Rows added with "Add row" are exported with '' in the role columns
+            if not isinstance(value, bool) and value not in (0, 1, '', None):
+                raise ValueError(f'author {i}: "{key}" must be true or false')
+            record[role] = bool(value)
+
+        for col in ('First Name', 'Last Name'):
+            if col not in author:
+                raise ValueError(f'author {i}: missing column "{col}"')
+        if not record['First Name'].strip() and not record['Last Name'].strip():
+            raise ValueError(f'author {i}: the name is empty')
+
+        records.append(record)
+
+    # Blank initials are generated like for a pasted list, unique among the given ones
+    missing = {i: {'first_name': record['First Name'].strip(), 'middle_name': record['Middle Name'].strip(),
+                   'surname': record['Last Name'].strip()}
+               for i, record in enumerate(records) if not record['Initials'].strip()}
+    generate_unique_initials(missing, (record['Initials'] for record in records if record['Initials'].strip()))
+    for i, author in missing.items():
+        records[i]['Initials'] = author['initials']
+    return records
+
+def iter_ndjson(lines):
+    # Lazily yield non-empty lines so that large exports are read one manuscript at a time
+    for line_no, line in enumerate(lines, start=1):
+        line = line.strip()
+        if line:
+            yield line_no, line
+
+def generate_credit_text(data):
+    update = pd.DataFrame(data)
+    update = update.drop(columns=update.columns[0])
+
+    manuscript = "CRediT: "
+    manuscript2 = "CRediT: "
+    manuscript3 = "CRediT: "
+
+    for col in update.columns[4:]:
+        condition_true = update[col] == True
+        if condition_true.empty == False:
+            selected_data = update.loc[condition_true, 'Initials']
+            manuscript += str(col) + ': ' + ', '.join(selected_data) + '; '
+
+    for i, row in update.iterrows():
+        name = ' '.join(row.iloc[:3].fillna(''))
+        initials = row.iloc[3]
+        selected_cols = [col for col in update.columns[4:] if row[col] == True]
+        cols_to_use = ', '.join(selected_cols)
+
+        if selected_cols:
+            manuscript2 += f'{name}: {cols_to_use}; '
+            manuscript3 += f'{initials}: {cols_to_use}; '
+
+    manuscript2 = manuscript2.replace('  ', ' ')
+    manuscript3 = manuscript3.replace('  ', ' ')
+
+    manuscript = manuscript[:-2]
+    manuscript2 = manuscript2[:-2]
+    manuscript3 = manuscript3[:-2]
+
+    return manuscript, manuscript2, manuscript3
+
+def batch_process(input_path, output_path):
+    with open(input_path, encoding='utf-8-sig') as source, open(output_path, 'w', encoding='utf-8') as target:
+        for line_no, line in iter_ndjson(source):
+            result = {'line': line_no}
+            try:
+                manuscript = json.loads(line)
+                if isinstance(manuscript, dict) and 'id' in manuscript:
+                    result['id'] = manuscript['id']
+                records = load_json_records(manuscript)
+                result['credit'], result['credit_reversed'], result['credit_reversed_short'] = generate_credit_text(records)
+                result['duplicates'] = format_duplicates(find_duplicates(records))
+            except ValueError as e:
+                result['error'] = str(e)
+            target.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+def parse_contents(contents, filename, set_progress=lambda progress: None):
     content_type, content_string = contents.split(',')
     decoded = base64.b64decode(content_string)
 
     try:
         if filename.endswith('.json'):
-            json_str = decoded.decode('utf-8')
-            json_io = StringIO(json_str)
-            df = pd.read_json(json_io)
-            df = df.reset_index()
-            df = df.rename(columns={df.columns[0]: 'Role'})
-            df['Role'] = df['Role'] + 1
-            return df
+            records = load_json_records(json.loads(decoded))
+            return pd.DataFrame(records, columns=table_columns)
+        elif filename.endswith(('.ndjson', '.jsonl')):
+            # Only one manuscript fits into the table, files with more go through batch mode
+            manuscripts = [line for line_no, line in iter_ndjson(decoded.decode('utf-8-sig').splitlines())]
+            if not manuscripts:
+                raise ValueError('no manuscript found')
+            if len(manuscripts) > 1:
+                raise ValueError(f'the file contains {len(manuscripts)} manuscripts, upload one manuscript per file '
+                                 'or process them all with "python app.py --batch INPUT OUTPUT"')
+            records = load_json_records(json.loads(manuscripts[0]))
+            return pd.DataFrame(records, columns=table_columns)
         elif filename.endswith('.xml'):
             root = etree.fromstring(decoded)
             xml_str = etree.tostring(root, pretty_print=True, encoding='unicode')
 
             data = []
             initials_dict_nested = {}
-            for i, contrib in enumerate(root.findall('.//contrib'), start=1):
+            contribs = root.findall('.//contrib')
+            for i, contrib in enumerate(contribs, start=1):
+                if i % 500 == 0:
+                    set_progress((10 + 50 * i // len(contribs), f'Parsing the file: {i} of {len(contribs)} authors'))
                 given_names = contrib.find('.//given-names').text if contrib.find('.//given-names') is not None else ''
                 last_name = contrib.find('.//surname').text if contrib.find('.//surname') is not None else ''
 
@@ -185,7 +348,7 @@ def parse_contents(contents, filename):
                 
                 for role in contrib.findall('.//role'):
                     role_name = role.text
-                    contrib_data[role_name] = True
+                    contrib_data[role_lookup.get(normalize_role_name(role_name), role_name)] = True
                 
                 data.append(contrib_data)
 
@@ -212,10 +375,256 @@ def parse_contents(contents, filename):
         return f'There was an error processing the file {filename}: {str(e)}'
 
 
-app = dash.Dash(__name__, suppress_callback_exceptions=True, external_stylesheets=[dbc.themes.BOOTSTRAP])
+assets_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+build_dir = os.environ.get('CREDIT_BUILD_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'build'))
+
+# Displayed width of the images in CSS pixels, a second variant is built for high-density screens
+image_widths = {
+    'CRediT-solid-01.png': 330,
+    '3logo_EC_NPO_MSMT_en.jpg': 660,
+}
+compressible = ('.css', '.svg', '.ico', '.json', '.xml')
+asset_urls = {}
+asset_srcsets = {}
+
+def build_asset(name, digest, render):
+    stem, ext = os.path.splitext(name)
+    hashed = f'{stem}.{digest[:12]}{ext}'
+    path = os.path.join(build_dir, hashed)
+
+    if not os.path.exists(path):
+        content = render()
+        if content is None:
+            return None
+        files = [(path, content)]
+        if ext in compressible:
+            files.append((path + '.gz', gzip.compress(content, 9, mtime=0)))
+            if brotli is not None:
+                files.append((path + '.br', brotli.compress(content)))
+        # Write the plain file last so that its presence means the build of this asset is complete
+        for file_path, file_content in reversed(files):
+            tmp_path = f'{file_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(file_content)
+            os.replace(tmp_path, file_path)
+
+    return '/build/' + hashed
+
+def resize_image(content, width):
+    image = Image.open(BytesIO(content))
+    if image.width <= width:
+        return None
+    image_format = image.format
+    image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+    stream = BytesIO()
+    if image_format == 'JPEG':
+        image.save(stream, 'JPEG', quality=85, optimize=True, progressive=True)
+    else:
+        image.save(stream, image_format, optimize=True)
+    # Palette images can grow when resampled, the browser scales the original then
+    return stream.getvalue() if len(stream.getvalue()) < len(content) else None
+
+def build_assets():
+    os.makedirs(build_dir, exist_ok=True)
+    for name in sorted(os.listdir(assets_dir)):
+        path = os.path.join(assets_dir, name)
+        if not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        asset_urls[name] = build_asset(name, digest, lambda: content)
+
+        if name in image_widths and Image is not None:
+            # Variants are only used when they are smaller than the original, the 2x one falls back to it
+            stem, ext = os.path.splitext(name)
+            variants = []
+            for width in (image_widths[name], 2 * image_widths[name]):
+                variant_digest = hashlib.sha256(content + str(width).encode()).hexdigest()
+                variants.append(build_asset(f'{stem}-{width}w{ext}', variant_digest, lambda: resize_image(content, width)))
+            if variants[0] is not None:
+                asset_srcsets[name] = f'{variants[0]} 1x, {variants[1] or asset_urls[name]} 2x'
+                asset_urls[name] = variants[0]
+
+build_assets()
+
+# Parsing and exports run in a local process pool when CREDIT_BACKGROUND_JOBS is set,
+# its value limits the number of heavy jobs running at once on this node (requires dash[diskcache])
+background_jobs = int(os.environ.get('CREDIT_BACKGROUND_JOBS', 0))
+job_cache = None
+background_callback_manager = None
+if background_jobs > 0:
+    import diskcache
+    import multiprocess
+    import psutil
+
+    # Jobs forked straight from the threaded web server inherit the SQLite locks other request threads hold
+    # at that moment and hang on the cache, a single threaded fork server with the app preloaded forks them instead
+    if 'forkserver' in multiprocess.get_all_start_methods():
+        multiprocess.set_start_method('forkserver', force=True)
+        multiprocess.set_forkserver_preload([__name__])
+
+    class JobManager(dash.DiskcacheManager):
+        def terminate_job(self, job):
+            # A finished job may exit between the existence check and the lookup of its children
+            with contextlib.suppress(psutil.NoSuchProcess):
+                super().terminate_job(job)
+
+    job_cache = diskcache.Cache(os.environ.get('CREDIT_JOB_CACHE', './cache'))
+    background_callback_manager = JobManager(job_cache, expire=3600)
+
+app = dash.Dash(__name__, suppress_callback_exceptions=True,
+                external_stylesheets=[dbc.themes.BOOTSTRAP, asset_urls['styles.css']],
+                assets_ignore=r'styles\.css', compress=flask_compress is not None,
+                background_callback_manager=background_callback_manager)
+server = app.server
 app.title = "CRediT Generator"
 app._favicon = ("favicon.ico")
 
+@app.server.route('/build/<path:filename>')
+def serve_build_file(filename):
+    path = safe_join(build_dir, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    served_path, encoding = path, None
+    for accepted, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[accepted] and os.path.isfile(path + suffix):
+            served_path, encoding = path + suffix, accepted
+            break
+
+    response = send_file(served_path, mimetype=mimetypes.guess_type(filename)[0], conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.vary.add('Accept-Encoding')
+    return response
+
+job_status_visible = {'position': 'fixed', 'bottom': '1rem', 'right': '1rem', 'width': '20rem', 'padding': '1rem',
+                      'background-color': 'white', 'border': '1px solid #d9d9d9', 'border-radius': '5px', 'z-index': 10}
+job_status_hidden = dict(job_status_visible, display='none')
+
+def heavy_callback(*args, **kwargs):
+    # Heavy callbacks always receive set_progress first, in the default mode it does nothing
+    if background_callback_manager is not None:
+        return app.callback(*args, background=True,
+                            progress=[Output('job-progress', 'value'), Output('job-progress', 'label')],
+                            progress_default=[0, ''],
+                            cancel=[Input('cancel-job', 'n_clicks')],
+                            running=[(Output('job-status', 'style'), job_status_visible, job_status_hidden)],
+                            **kwargs)
+
+    def decorator(func):
+        def wrapper(*values):
+            return func(lambda progress: None, *values)
+        wrapper.__name__ = func.__name__
+        return app.callback(*args, **kwargs)(wrapper)
+    return decorator
+
+job_slot_lease = 30
+
+def renew_job_slot(slot, job_id, stop):
+    while not stop.wait(job_slot_lease / 3):
+        with job_cache.transact():
+            if job_cache.get(slot) == job_id:
+                job_cache.touch(slot, expire=job_slot_lease)
+
+@contextlib.contextmanager
+def heavy_job_slot(set_progress):
+    if job_cache is None:
+        yield
+        return
+
+    # Every slot is a cache key holding the job id with a short lease that the running job keeps renewing.
+    # A cancelled job is killed without releasing its slot, the lease then expires and the slot is free again.
+    job_id = uuid.uuid4().hex
+    slot = None
+    set_progress((0, 'Waiting for a free worker'))
+    while slot is None:
+        for i in range(background_jobs):
+            if job_cache.add(f'heavy-job-slot-{i}', job_id, expire=job_slot_lease):
+                slot = f'heavy-job-slot-{i}'
+                break
+        else:
+            time.sleep(0.5)
+
+    stop = threading.Event()
+    threading.Thread(target=renew_job_slot, args=(slot, job_id, stop), daemon=True).start()
+    try:
+        yield
+    finally:
+        stop.set()
+        with job_cache.transact():
+            if job_cache.get(slot) == job_id:
+                job_cache.delete(slot)
+
+# Opt-in allocation accounting with CREDIT_MEMORY_STATS=1. tracemalloc counts the allocations of all threads
+# together, so tracked callbacks run one at a time in a worker and its latency is not representative while
+# enabled. Untracked requests still add noise to a sample: the first call of every callback only warms it up
+# and the last memory_samples calls are kept to report their median.
+memory_stats_enabled = os.environ.get('CREDIT_MEMORY_STATS', '') not in ('', '0')
+memory_stats = {}
+memory_samples = 15
+memory_lock = threading.Lock()
+memory_pid = None
+if memory_stats_enabled:
+    tracemalloc.start()
+
+@app.server.before_request
+def remember_worker_pid():
+    # The process serving requests, gunicorn --preload forks its workers only after importing the app
+    global memory_pid
+    memory_pid = os.getpid()
+
+def count_authors(values):
+    for value in values:
+        if isinstance(value, list) and value and isinstance(value[0], dict) and 'Role' in value[0]:
+            return len(value)
+    return 0
+
+def track_memory(name):
+    def decorator(func):
+        if not memory_stats_enabled:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            # Background jobs run in processes of their own that serve no requests, the lock may be copied there
+            # held and nobody reads their stats
+            if os.getpid() != memory_pid:
+                return func(*args)
+
+            with memory_lock:
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                result = func(*args)
+                current, peak = tracemalloc.get_traced_memory()
+
+                if name not in memory_stats:
+                    memory_stats[name] = {}
+                    return result
+                outputs = tuple(result) if isinstance(result, (list, tuple)) else ()
+                authors = str(count_authors(args + outputs))
+                entry = memory_stats[name].setdefault(authors, {'calls': 0, 'peak_bytes': [], 'retained_bytes': []})
+                entry['calls'] += 1
+                entry['peak_bytes'] = entry['peak_bytes'][1 - memory_samples:] + [peak - before]
+                entry['retained_bytes'] = entry['retained_bytes'][1 - memory_samples:] + [current - before]
+            return result
+        return wrapper
+    return decorator
+
+@app.server.route('/_memory-stats')
+def serve_memory_stats():
+    # Median peak and retained bytes per callback and author count, background jobs are not measured
+    if not memory_stats_enabled:
+        abort(404)
+    with memory_lock:
+        return {'callbacks': {name: {authors: {'calls': entry['calls'],
+                                               'peak_bytes': statistics.median(entry['peak_bytes']),
+                                               'retained_bytes': statistics.median(entry['retained_bytes'])}
+                                     for authors, entry in by_authors.items()}
+                              for name, by_authors in memory_stats.items()}}
+
 
 app.index_string = '''<!DOCTYPE html>
 <html>
@@ -234,7 +643,7 @@ app.index_string = '''<!DOCTYPE html>
     </script>
 {%metas%}
 <title>{%title%}</title>
-{%favicon%}
+<link rel="icon" type="image/x-icon" href="''' + asset_urls['favicon.ico'] + '''">
 {%css%}
 </head>
 <body>
@@ -252,7 +661,8 @@ app.index_string = '''<!DOCTYPE html>
 app.layout = html.Div([
     dbc.Container(children=[
         html.Header(children=[
-            html.Img(src='assets/CRediT-solid-01.png', 
+            html.Img(src=asset_urls['CRediT-solid-01.png'],
+                     srcSet=asset_srcsets.get('CRediT-solid-01.png'),
                      alt="Logo-CRediT-Generator", 
                      width='25%', 
                      style={
@@ -396,6 +806,7 @@ app.layout = html.Div([
                             ),
                         html.Div(id='table-container'),
                         dcc.Store(id='table-data'),               
+                        dcc.Store(id='author-names'),
                         html.Div([
                             dbc.Button('Generate CRediT text for manuscript', id='generate-button', disabled=True, n_clicks=0, className='ok_button', style={'margin-right':'1rem'}),
                             dbc.Button('Add row', disabled=True, id='add-row'),     
@@ -444,10 +855,17 @@ app.layout = html.Div([
             )
         ]),
 
+        html.Div(id='job-status', children=[
+            html.P('Working on your authors...', style={'margin-bottom':'.5rem'}),
+            dbc.Progress(id='job-progress', value=0, striped=True, animated=True, style={'margin-bottom':'.5rem'}),
+            dbc.Button('Cancel', id='cancel-job', n_clicks=0, size='sm', color='secondary'),
+        ], style=job_status_hidden),
+
         html.Hr(style={'color':'black', 'opacity':1}),
         html.Div(children=[
             html.H6("Supported by the project National Institute for Research of Metabolic and Cardiovascular Diseases (Programme EXCELES, ID Project No. LX22NPO5104) – Funded by the European Union – Next Generation EU."),
-            html.Img(src='assets/3logo_EC_NPO_MSMT_en.jpg', 
+            html.Img(src=asset_urls['3logo_EC_NPO_MSMT_en.jpg'],
+                     srcSet=asset_srcsets.get('3logo_EC_NPO_MSMT_en.jpg'),
                      alt="Logo-CRediT-Generator", 
                      width='50%')
         ], id='credits', style={
@@ -470,40 +888,32 @@ app.layout = html.Div([
 ])
 
 
-@app.callback(
-    [Output('table-container', 'children'),
-     Output('table-data', 'data'),
-     Output('generate-button', 'disabled'),
-     Output('add-row', 'disabled'),
-     Output('done-proceed', 'style'),],
-    [Input('read-list-button', 'n_clicks'),
-     Input('add-row', 'n_clicks'),
-     Input({'type': 'input-text', 'index': dash.dependencies.ALL, 'column': dash.dependencies.ALL}, 'value'),
-     Input({'type': 'input-checkbox', 'index': dash.dependencies.ALL, 'column': dash.dependencies.ALL}, 'value'),
-     Input('upload-xml-json', 'contents')],
-    [State('rawlist', 'value'),
-     State('table-data', 'data'),
-     State('upload-xml-json', 'filename')]
+@heavy_callback(
+    [Output('table-container', 'children', allow_duplicate=True),
+     Output('table-data', 'data', allow_duplicate=True),
+     Output('author-names', 'data', allow_duplicate=True),
+     Output('generate-button', 'disabled', allow_duplicate=True),
+     Output('add-row', 'disabled', allow_duplicate=True),
+     Output('done-proceed', 'style', allow_duplicate=True)],
+    Input('read-list-button', 'n_clicks'),
+    State('rawlist', 'value'),
+    prevent_initial_call=True
 )
-def update_output(read_list, add_row, input_values, checkbox_values, upload_content, rawlist, data, upload_filename):
-
-    ctx = callback_context
-    if not ctx.triggered:
-        raise dash.exceptions.PreventUpdate
-
-    trigger = ctx.triggered[0]['prop_id']
-
-    if trigger == 'read-list-button.n_clicks':
+@track_memory('read list')
+def read_list(set_progress, read_list, rawlist):
+    with heavy_job_slot(set_progress):
+        set_progress((10, 'Reading the list'))
         authors = rawlist    
        
-        cleaned_authors = re.sub(r'[^a-zA-Z,\s]', '', authors)
+        cleaned_authors = re.sub(r'[^\w,\s]|[\d_]', '', authors)
         cleaned_authors2 = re.sub(r',+', ',', cleaned_authors)
         if cleaned_authors2.endswith(','):        
             cleaned_authors2 = cleaned_authors2[:-1]
         
         author_list = [author.strip() for author in cleaned_authors2.split(',')]
 
-        nested_author_dict = {f"author_{i+1}": extract_name_parts(author) for i, author in enumerate(author_list)}
+        nested_author_dict = {f"author_{i+1}": extract_name_parts(author_list[i])
+                              for i in progress_range(len(author_list), set_progress, 10, 40, 'Reading the list')}
 
         generate_unique_initials(nested_author_dict)        
         pp.pprint(nested_author_dict)
@@ -518,6 +928,8 @@ def update_output(read_list, add_row, input_values, checkbox_values, upload_cont
         data = {variable: [] for variable in variables}
 
         for idx, (key, author) in enumerate(nested_author_dict.items(), start=1):
+            if idx % 500 == 0:
+                set_progress((40 + 20 * idx // len(nested_author_dict), f'Reading the list: {idx} of {len(nested_author_dict)} authors'))
             data['role'].append(idx)
             data['first_name'].append(author['first_name'])
             data['middle_name'].append(author['middle_name'])
@@ -548,8 +960,50 @@ def update_output(read_list, add_row, input_values, checkbox_values, upload_cont
                                 'Project administration', 'Resources', 'Software', 'Supervision', 'Validation', 'Visualization',
                                 'Writing – original draft', 'Writing – review & editing',])
 
-        return generate_table(df), df.to_dict('records'), False, False, {'display':'block'}
-    
+        records = df.to_dict('records')
+        return generate_table(df, set_progress), records, author_names(records), False, False, {'display':'block'}
+
+@heavy_callback(
+    [Output('table-container', 'children', allow_duplicate=True),
+     Output('table-data', 'data', allow_duplicate=True),
+     Output('author-names', 'data', allow_duplicate=True),
+     Output('generate-button', 'disabled', allow_duplicate=True),
+     Output('add-row', 'disabled', allow_duplicate=True)],
+    Input('upload-xml-json', 'contents'),
+    State('upload-xml-json', 'filename'),
+    prevent_initial_call=True
+)
+@track_memory('upload')
+def load_upload(set_progress, upload_content, upload_filename):
+    with heavy_job_slot(set_progress):
+        set_progress((10, 'Parsing the file'))
+        df = parse_contents(upload_content, upload_filename, set_progress)
+        if isinstance(df, str):
+            return dbc.Alert(df, color='danger'), dash.no_update, dash.no_update, True, True
+        records = df.to_dict('records')
+        return generate_table(df, set_progress), records, author_names(records), False, False
+
+@app.callback(
+    [Output('table-container', 'children'),
+     Output('table-data', 'data'),
+     Output('author-names', 'data'),
+     Output('generate-button', 'disabled'),
+     Output('add-row', 'disabled'),
+     Output('done-proceed', 'style'),],
+    [Input('add-row', 'n_clicks'),
+     Input({'type': 'input-text', 'index': dash.dependencies.ALL, 'column': dash.dependencies.ALL}, 'value'),
+     Input({'type': 'input-checkbox', 'index': dash.dependencies.ALL, 'column': dash.dependencies.ALL}, 'value')],
+    [State('table-data', 'data')]
+)
+@track_memory('edit table')
+def edit_table(add_row, input_values, checkbox_values, data):
+
+    ctx = callback_context
+    if not ctx.triggered:
+        raise dash.exceptions.PreventUpdate
+
+    trigger = ctx.triggered[0]['prop_id']
+
     if trigger == 'add-row.n_clicks':
         df = pd.DataFrame(data)
         new_row = {col: '' for col in df.columns}
@@ -557,11 +1011,7 @@ def update_output(read_list, add_row, input_values, checkbox_values, upload_cont
         new_row = {k: [v] for k, v in new_row.items()}
         df_new_row = pd.DataFrame(new_row)
         df = pd.concat([df, df_new_row], ignore_index=True)
-        return generate_table(df), df.to_dict('records'), False, False, {'display':'block'}
-    
-    if trigger == 'upload-xml-json.contents':
-        df = parse_contents(upload_content, upload_filename)
-        return generate_table(df), df.to_dict('records'), False, False, dash.no_update
+        return generate_table(df), df.to_dict('records'), dash.no_update, False, False, {'display':'block'}
     
     if ("input-text" in trigger) or ("input-checkbox" in trigger):
         input_groups = [input_values[i:i + 4] for i in range(0, len(input_values), 4)]
@@ -614,9 +1064,27 @@ def update_output(read_list, add_row, input_values, checkbox_values, upload_cont
                     'Project administration', 'Resources', 'Software', 'Supervision', 'Validation', 'Visualization',
                     'Writing – original draft', 'Writing – review & editing',])
 
-        return generate_table(update), update.to_dict('records'), False, False, dash.no_update
+        records = update.to_dict('records')
+        # Toggling a role leaves the names and so the duplicate check alone
+        names = author_names(records) if "input-text" in trigger else dash.no_update
+        return generate_table(update), records, names, False, False, dash.no_update
     
-    return dash.no_update, dash.no_update, True, True, dash.no_update
+    return dash.no_update, dash.no_update, dash.no_update, True, True, dash.no_update
+
+def author_names(records):
+    # The duplicate check only depends on the names, it runs after Read List, an upload or a name change
+    return [{col: record.get(col) for col in ['Role'] + name_columns[:3]} for record in records]
+
+@app.callback(
+    Output('duplicates', 'children'),
+    Input('author-names', 'data'),
+    prevent_initial_call=True
+)
+@track_memory('duplicates')
+def update_duplicates(data):
+    if not data:
+        return ''
+    return format_duplicates(find_duplicates(data))
 
 @app.callback(Output('uploaded-filename', 'children'),
               Output('done-proceed-upload', 'style'),
@@ -629,7 +1097,7 @@ def update_query_output_filename(filename):
     trigger = ctx.triggered[0]['prop_id']
 
     if trigger == 'upload-xml-json.filename':
-        return [html.Img(src='assets/file-earmark-check.svg', style={'display': 'inline-block', 'margin-right':'.5em'}),
+        return [html.Img(src=asset_urls['file-earmark-check.svg'], style={'display': 'inline-block', 'margin-right':'.5em'}),
                 html.P(filename, style={'display': 'inline-block'})
                 ], {'display':'block'}
 
@@ -642,55 +1110,27 @@ def update_query_output_filename(filename):
     Input('generate-button', 'n_clicks'),
     Input('table-data', 'data')
 )
+@track_memory('generate text')
 def update_output(generate_btn, data):
     if generate_btn > 0:
-
-        update = pd.DataFrame(data)
-        update = update.drop(columns=update.columns[0], axis=1)
-
-        manuscript = "CRediT: "
-        manuscript2 = "CRediT: "
-        manuscript3 = "CRediT: "
-
-        for col in update.columns[4:]:
-            condition_true = update[col] == True
-            if condition_true.empty == False:
-                selected_data = update.loc[condition_true, 'Initials']
-                manuscript += str(col) + ': ' + ', '.join(selected_data) + '; '
-
-        for i, row in update.iterrows():
-            name = ' '.join(row.iloc[:3].fillna(''))
-            initials = row.iloc[3]
-            selected_cols = [col for col in update.columns[4:] if row[col] == True]
-            cols_to_use = ', '.join(selected_cols)
-
-            if selected_cols:
-                manuscript2 += f'{name}: {cols_to_use}; '
-                manuscript3 += f'{initials}: {cols_to_use}; '
-
-        manuscript2 = manuscript2.replace('  ', ' ')
-        manuscript3 = manuscript3.replace('  ', ' ')
-
-        manuscript = manuscript[:-2]
-        manuscript2 = manuscript2[:-2]
-        manuscript3 = manuscript3[:-2]
-
+        manuscript, manuscript2, manuscript3 = generate_credit_text(data)
         return manuscript, manuscript2, manuscript3, False, False
 
     return "", "", "", True, True
 
 
-@app.callback(
+@heavy_callback(
     Output("download-xml", "data"),
-    Input('table-data', 'data'),
     Input('generate-jats4r', 'n_clicks'),
+    State('table-data', 'data'),
     prevent_initial_call=True
 )
-def update_output(data, jats4r_btn):
-    if jats4r_btn > 0:
+@track_memory('download xml')
+def export_xml(set_progress, jats4r_btn, data):
+    with heavy_job_slot(set_progress):
 
         update = pd.DataFrame(data)
-        update = update.drop(columns=update.columns[0], axis=1)
+        update = update.drop(columns=update.columns[0])
 
         doctype = '<!DOCTYPE article PUBLIC "-//NLM//DTD JATS (Z39.96) Journal Archiving and Interchange DTD with MathML3 v1.2 20190208//EN" "JATS-archivearticle1-mathml3.dtd">'
 
@@ -738,12 +1178,14 @@ def update_output(data, jats4r_btn):
         body = etree.SubElement(root, "body")
 
         for i, row in update.iterrows():
+            if i % 500 == 0:
+                set_progress((int(100 * i / len(update)), f'{i} of {len(update)} authors'))
             contrib = etree.SubElement(contrib_group, "contrib", attrib={"contrib-type": "author"},)
             string_name = etree.SubElement(contrib, "string-name")
             given_names = etree.SubElement(string_name, "given-names")
             surname = etree.SubElement(string_name, "surname")
 
-            if row[1] == '':
+            if row.iloc[1] == '':
                 given_names.text = row.iloc[0]
             else:
                 given_names.text = row.iloc[0] + ' ' + row.iloc[1]
@@ -768,17 +1210,18 @@ def update_output(data, jats4r_btn):
         
         return dict(content=base64_xml, filename="credit_result.xml", base64=True)
     
-@app.callback(
+@heavy_callback(
     Output("download-json", "data"),
-    Input('table-data', 'data'),
     Input('generate-json', 'n_clicks'),
+    State('table-data', 'data'),
     prevent_initial_call=True
 )
-def update_output(data, json_btn):
-    if json_btn > 0:
+@track_memory('download json')
+def export_json(set_progress, json_btn, data):
+    with heavy_job_slot(set_progress):
 
         update = pd.DataFrame(data)
-        update = update.drop(columns=update.columns[0], axis=1)
+        update = update.drop(columns=update.columns[0])
 
         json_data = update.to_json(orient='records', indent=4)
 
@@ -790,9 +1233,138 @@ def update_output(data, json_btn):
         return dict(content=base64_json, filename="credit_result.json", base64=True)
 
 
-def find_duplicates(arr):
-    sorted_arr = sorted(arr)
-    return [item for item, count in collections.Counter(sorted_arr).items() if count > 1]
+def name_key(name):
+    # "Tomáš Čajka" -> "tomas cajka", "T." -> "t"
+    name = unicodedata.normalize('NFKD', str(name or ''))
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^a-z\s]', ' ', name.lower()).split())
+
+def names_similar(a, b):
+    return a == b or difflib.SequenceMatcher(None, a, b).ratio() >= 0.88
+
+def given_names_match(a, b):
+    # An initial matches any name starting with the same letter, full names only differ by a typo of the same
+    # length so that gendered forms like Petr/Petra or Jan/Jana stay apart
+    for x, y in zip(a.split(), b.split()):
+        if len(x) == 1 or len(y) == 1:
+            if x[0] != y[0]:
+                return False
+        elif x != y and (len(x) != len(y) or not names_similar(x, y)):
+            return False
+    return True
+
+# Neighbours compared in the sorted name lists and names an abbreviation is compared with
+duplicate_window = 3
+duplicate_block_limit = 200
+
+def sorted_neighbours(keys):
+    # Pairs of keys close to each other in alphabetical order, or in the order of their reversed spelling
+    # so that a typo in the first letters is caught as well
+    pairs = set()
+    for order in (None, lambda key: key[0][::-1]):
+        ordered = sorted(keys, key=order)
+        for i, a in enumerate(ordered):
+            for b in ordered[i + 1:i + 1 + duplicate_window]:
+                pairs.add((a, b) if a < b else (b, a))
+    return pairs
+
+def match_given_names(names_a, names_b=()):
+    # Pairs of distinct given names within one block, or from names_a to names_b across two blocks.
+    # Abbreviations like "t m" match many spellings and are compared with the whole block, full names only
+    # with their sorted neighbours.
+    entries = [(name, 0) for name in names_a] + [(name, 1) for name in names_b]
+    abbreviations = [entry for entry in entries if all(len(part) == 1 for part in entry[0].split())]
+    full_names = [entry for entry in entries if entry not in abbreviations]
+
+    candidates = sorted_neighbours(full_names)
+    for abbreviation in abbreviations[:duplicate_block_limit]:
+        candidates.update((min(abbreviation, entry), max(abbreviation, entry))
+                          for entry in entries[:duplicate_block_limit] if entry != abbreviation)
+
+    pairs = set()
+    for (x, side_x), (y, side_y) in candidates:
+        if (side_x != side_y if names_b else True) and given_names_match(x, y):
+            pairs.add((x, y) if side_x <= side_y else (y, x))
+    return pairs
+
+def find_duplicates(records):
+    # Groups of records that may be the same author, matching pairs are merged with union-find
+    parent = list(range(len(records)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(indices):
+        for i in indices[1:]:
+            parent[find(i)] = find(indices[0])
+
+    # Block on the normalized surname and the first initial, equal names fall together without comparing them
+    blocks = collections.defaultdict(lambda: collections.defaultdict(list))
+    for i, record in enumerate(records):
+        given = name_key(f"{record.get('First Name') or ''} {record.get('Middle Name') or ''}")
+        surname = name_key(record.get('Last Name'))
+        if not given and not surname:
+            continue
+        blocks[(surname, given[:1])][given].append(i)
+
+    for block in blocks.values():
+        for same in block.values():
+            union(same)
+        for x, y in match_given_names(block):
+            union([block[x][0], block[y][0]])
+
+    # Surname typos: the same within neighbouring surnames
+    initials = collections.defaultdict(set)
+    for surname, initial in blocks:
+        initials[surname].add(initial)
+    for (a, _), (b, _) in sorted_neighbours([(surname, 0) for surname in initials]):
+        if not names_similar(a, b):
+            continue
+        for initial in initials[a] & initials[b]:
+            block_a, block_b = blocks[(a, initial)], blocks[(b, initial)]
+            for x, y in match_given_names(block_a, block_b):
+                union([block_a[x][0], block_b[y][0]])
+
+    groups = collections.defaultdict(list)
+    for block in blocks.values():
+        for same in block.values():
+            for i in same:
+                groups[find(i)].append(records[i])
+    groups = [sorted(group, key=lambda record: record['Role']) for group in groups.values() if len(group) > 1]
+    return sorted(groups, key=lambda group: group[0]['Role'])
+
+# Long lists with many namesakes are cut to keep the page and the batch output small
+duplicate_groups_shown = 20
+duplicate_names_shown = 10
+
+def format_duplicates(groups):
+    if not groups:
+        return ''
+
+    def full_name(record):
+        return ' '.join(str(record.get(col) or '') for col in name_columns[:3]).replace('  ', ' ').strip()
+
+    shown = []
+    for group in groups[:duplicate_groups_shown]:
+        names = ', '.join(f"{full_name(record)} ({record['Role']})" for record in group[:duplicate_names_shown])
+        if len(group) > duplicate_names_shown:
+            names += f' and {len(group) - duplicate_names_shown} more'
+        shown.append(names)
+    text = 'Possible duplicate authors: ' + '; '.join(shown)
+    if len(groups) > duplicate_groups_shown:
+        text += f' (and {len(groups) - duplicate_groups_shown} more groups)'
+    return text
 
 if __name__ == '__main__':
-    app.run_server(debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='CRediT Generator')
+    parser.add_argument('--batch', nargs=2, metavar=('INPUT', 'OUTPUT'),
+                        help='generate CRediT texts for every manuscript of an NDJSON file and write them as NDJSON')
+    args = parser.parse_args()
+
+    if args.batch:
+        batch_process(*args.batch)
+    else:
+        app.run_server(debug=True)
\ No newline at end of file
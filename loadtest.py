@@ -0,0 +1,324 @@
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+first_names = ['Tomas', 'Jiri', 'Stanislava', 'Kristyna', 'Michaela', 'Lucie', 'Veronika', 'Oliver', 'Ondrej',
+               'Marie', 'Laurence', 'Thierry', 'Marcela', 'Zbynek', 'Jan', 'Jana', 'Petr', 'Eva', 'Martin', 'Anna']
+middle_names = ['', '', '', '', 'Rudl', 'J', 'Maria', 'K']
+surnames = ['Cajka', 'Hricko', 'Rakusanova', 'Brejchova', 'Novakova', 'Kulhava', 'Hola', 'Paucova', 'Fiehn', 'Kuda',
+            'Paluchova', 'Brezinova', 'Balas', 'Durand', 'Krizova', 'Stranak', 'Novak', 'Svoboda', 'Dvorak', 'Cerny']
+
+roles = ['Conceptualization', 'Data curation', 'Formal Analysis', 'Funding acquisition', 'Investigation', 'Methodology',
+         'Project administration', 'Resources', 'Software', 'Supervision', 'Validation', 'Visualization',
+         'Writing – original draft', 'Writing – review & editing']
+name_columns = ['First Name', 'Middle Name', 'Last Name', 'Initials']
+
+
+def generate_id(string):
+    return string.lower().replace(' & ', '_').replace(' – ', '_').replace(' ', '_')
+
+def random_author_list(rng, count):
+    authors = []
+    for i in range(count):
+        name = ' '.join(part for part in (rng.choice(first_names), rng.choice(middle_names), rng.choice(surnames)) if part)
+        # Numbered affiliations and symbols like in a list pasted from Word
+        authors.append(name + str(rng.randint(1, 9)) + rng.choice(['', '', '*', '#']))
+    return ', '.join(authors)
+
+def prop(component_id, prop_name, value):
+    return {'id': component_id, 'property': prop_name, 'value': value}
+
+def find_callbacks(dependencies):
+    callbacks = {}
+    for dependency in dependencies:
+        inputs = {f"{i['id']}.{i['property']}" for i in dependency['inputs']}
+        if 'read-list-button.n_clicks' in inputs:
+            callbacks['read list'] = dependency
+        elif 'add-row.n_clicks' in inputs:
+            callbacks['edit table'] = dependency
+        elif 'generate-button.n_clicks' in inputs:
+            callbacks['generate text'] = dependency
+        elif 'generate-jats4r.n_clicks' in inputs:
+            callbacks['download xml'] = dependency
+        elif 'generate-json.n_clicks' in inputs:
+            callbacks['download json'] = dependency
+        elif dependency['output'] == 'duplicates.children':
+            callbacks['duplicates'] = dependency
+    return callbacks
+
+
+class Client:
+    def __init__(self, base_url, callbacks, samples, timeout):
+        url = urllib.parse.urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.callbacks = callbacks
+        self.samples = samples
+        self.timeout = timeout
+        self.connection = None
+
+    def post(self, path, body):
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.connection.request('POST', path, body=json.dumps(body), headers={'Content-Type': 'application/json'})
+                response = self.connection.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, OSError):
+                # Keep-alive connections may be closed by the server between requests, retry once on a new one
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+
+    def call(self, name, inputs, state=(), changed=None):
+        dependency = self.callbacks[name]
+        outputs = [{'id': output.split('.')[0], 'property': output.split('.')[1].split('@')[0]}
+                   for output in dependency['output'].strip('.').split('...')]
+        body = {
+            'output': dependency['output'],
+            'outputs': outputs if dependency['output'].startswith('..') else outputs[0],
+            'inputs': inputs,
+            'state': list(state),
+            'changedPropIds': changed or [f"{inputs[0]['id']}.{inputs[0]['property']}"],
+        }
+
+        start = time.perf_counter()
+        try:
+            status, content = self.post('/_dash-update-component', body)
+            result = json.loads(content) if status == 200 else {}
+            # Background callbacks answer with a job that is polled until the result is ready
+            while status == 200 and 'cacheKey' in result and 'response' not in result:
+                if time.perf_counter() - start > self.timeout:
+                    raise TimeoutError(name)
+                time.sleep(0.05)
+                query = urllib.parse.urlencode({'cacheKey': result['cacheKey'], 'job': result['job']})
+                status, content = self.post('/_dash-update-component?' + query, body)
+                result = dict(result, **json.loads(content)) if status == 200 else {}
+            ok = status in (200, 204)
+        except (OSError, ValueError, http.client.HTTPException):
+            ok, result = False, {}
+        self.samples.append((name, time.perf_counter() - start, ok))
+        return result.get('response', {})
+
+    def table_changed(self, table, generate_clicks):
+        self.call('generate text', [prop('generate-button', 'n_clicks', generate_clicks), prop('table-data', 'data', table)])
+
+    def edit_table(self, table, index, role):
+        table[index][role] = not table[index][role]
+        text_inputs = [prop({'type': 'input-text', 'index': i, 'column': generate_id(col)}, 'value', row[col])
+                       for i, row in enumerate(table) for col in name_columns]
+        checkbox_inputs = [prop({'type': 'input-checkbox', 'index': i, 'column': generate_id(col)}, 'value', bool(row[col]))
+                           for i, row in enumerate(table) for col in roles]
+        changed = json.dumps({'column': generate_id(role), 'index': index, 'type': 'input-checkbox'},
+                             sort_keys=True, separators=(',', ':')) + '.value'
+        response = self.call('edit table', [prop('add-row', 'n_clicks', None), text_inputs, checkbox_inputs],
+                             [prop('table-data', 'data', table)], changed=[changed])
+        return response.get('table-data', {}).get('data', table)
+
+    def run_session(self, rng, authors, toggles):
+        response = self.call('read list', [prop('read-list-button', 'n_clicks', 1)],
+                             [prop('rawlist', 'value', random_author_list(rng, authors))])
+        table = response.get('table-data', {}).get('data')
+        if not table:
+            return False
+        # Only new names run the duplicate check, toggled roles do not
+        self.call('duplicates', [prop('author-names', 'data', response.get('author-names', {}).get('data'))])
+        self.table_changed(table, 0)
+
+        for _ in range(toggles):
+            table = self.edit_table(table, rng.randrange(len(table)), rng.choice(roles))
+            self.table_changed(table, 0)
+
+        self.call('generate text', [prop('generate-button', 'n_clicks', 1), prop('table-data', 'data', table)])
+        self.call('download xml', [prop('generate-jats4r', 'n_clicks', 1)], [prop('table-data', 'data', table)])
+        self.call('download json', [prop('generate-json', 'n_clicks', 1)], [prop('table-data', 'data', table)])
+        return True
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def summarize(samples, elapsed, sessions):
+    report = {'elapsed_s': round(elapsed, 3), 'sessions': sessions, 'requests': len(samples),
+              'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else 0.0, 'callbacks': {}}
+    for name in sorted({sample[0] for sample in samples}):
+        durations = [sample[1] * 1000 for sample in samples if sample[0] == name]
+        errors = sum(1 for sample in samples if sample[0] == name and not sample[2])
+        report['callbacks'][name] = {
+            'count': len(durations),
+            'error_rate': round(errors / len(durations), 4),
+            'p50_ms': round(percentile(durations, 0.50), 1),
+            'p95_ms': round(percentile(durations, 0.95), 1),
+            'p99_ms': round(percentile(durations, 0.99), 1),
+        }
+    return report
+
+def summarize_memory(memory_stats, budget_kb):
+    # The growth of the median peak between the smallest and the largest list leaves fixed overhead out
+    memory, over_budget = {}, []
+    for name, by_authors in sorted(memory_stats.get('callbacks', {}).items()):
+        sizes = sorted((int(authors), stats) for authors, stats in by_authors.items() if int(authors))
+        peak_per_author = None
+        if len(sizes) > 1:
+            (small, small_stats), (large, large_stats) = sizes[0], sizes[-1]
+            peak_per_author = (large_stats['peak_bytes'] - small_stats['peak_bytes']) / 1024 / (large - small)
+        memory[name] = {
+            'authors': {str(authors): {'calls': stats['calls'],
+                                       'peak_kb': round(stats['peak_bytes'] / 1024, 1),
+                                       'retained_kb': round(stats['retained_bytes'] / 1024, 1)}
+                        for authors, stats in sizes},
+            'peak_kb_per_author': None if peak_per_author is None else round(peak_per_author, 2),
+        }
+        if budget_kb is not None and peak_per_author is not None and peak_per_author > budget_kb:
+            over_budget.append(f'{name} from {sizes[0][0]} to {sizes[-1][0]} authors: {peak_per_author:.2f} KB per author')
+    return memory, over_budget
+
+def print_report(report):
+    print(f"{'callback':<16}{'count':>8}{'errors':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in report['callbacks'].items():
+        print(f"{name:<16}{stats['count']:>8}{stats['error_rate']:>9.1%}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+    if 'memory' in report:
+        print(f"\n{'callback':<16}{'authors':>8}{'calls':>8}{'peak KB':>10}{'retained KB':>13}{'KB/author':>11}")
+        for name, callback in report['memory'].items():
+            for i, (authors, stats) in enumerate(callback['authors'].items()):
+                last = i == len(callback['authors']) - 1
+                per_author = callback['peak_kb_per_author'] if last and callback['peak_kb_per_author'] is not None else ''
+                print(f"{name:<16}{authors:>8}{stats['calls']:>8}{stats['peak_kb']:>10}{stats['retained_kb']:>13}{per_author:>11}")
+    print(f"\n{report['sessions']} sessions, {report['requests']} requests in {report['elapsed_s']} s, "
+          f"{report['throughput_rps']} requests/s")
+
+def start_server(args):
+    here = os.path.dirname(os.path.abspath(__file__))
+    if args.server == 'gunicorn':
+        command = ['gunicorn', '--workers', str(args.workers), '--threads', str(args.threads),
+                   '--bind', f'127.0.0.1:{args.port}', 'app:server']
+    else:
+        command = [sys.executable, '-c', f'import app; app.app.run(port={args.port}, debug=False, threaded=True)']
+    env = dict(os.environ, CREDIT_MEMORY_STATS='1') if args.memory else None
+    # A session of its own lets stop_server reach background jobs and gunicorn workers as well
+    process = subprocess.Popen(command, cwd=here, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               start_new_session=hasattr(os, 'killpg'))
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with code {process.returncode}')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', args.port, timeout=1)
+            connection.request('GET', '/_dash-dependencies')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.5)
+    stop_server(process)
+    raise RuntimeError('server did not start within 60 s')
+
+def stop_server(process):
+    if not hasattr(os, 'killpg'):
+        process.terminate()
+        process.wait()
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        pass
+    # Children that outlived the server or ignored SIGTERM
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate concurrent CRediT Generator editing sessions')
+    parser.add_argument('--users', type=int, default=10, help='number of concurrent simulated users')
+    parser.add_argument('--sessions', type=int, default=3, help='editing sessions per user')
+    parser.add_argument('--authors', type=int, default=20, help='authors in each pasted list')
+    parser.add_argument('--toggles', type=int, default=10, help='role checkboxes toggled in each session')
+    parser.add_argument('--url', help='test a server that is already running instead of starting one')
+    parser.add_argument('--server', choices=['dash', 'gunicorn'], default='dash', help='how to start the app')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker')
+    parser.add_argument('--port', type=int, default=8051)
+    parser.add_argument('--timeout', type=float, default=120, help='seconds before a callback counts as failed')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='also write the report as JSON to this file')
+    parser.add_argument('--memory', action='store_true',
+                        help='collect peak and retained allocations per callback, sessions alternate between --authors '
+                             'and twice as many (the server needs CREDIT_MEMORY_STATS=1)')
+    parser.add_argument('--memory-budget', type=float, metavar='KB',
+                        help='fail when the peak of a callback grows by more than this many KB per added author, '
+                             'implies --memory (needs --users 1)')
+    args = parser.parse_args()
+    args.memory = args.memory or args.memory_budget is not None
+    if args.memory and args.users > 1:
+        # The server measures tracked callbacks one at a time, concurrent users would only queue up behind each other
+        parser.error('--memory and --memory-budget need --users 1')
+
+    process = None if args.url else start_server(args)
+    base_url = args.url or f'http://127.0.0.1:{args.port}'
+    try:
+        connection = http.client.HTTPConnection(urllib.parse.urlsplit(base_url).hostname,
+                                                urllib.parse.urlsplit(base_url).port or 80, timeout=args.timeout)
+        connection.request('GET', '/_dash-dependencies')
+        callbacks = find_callbacks(json.loads(connection.getresponse().read()))
+
+        samples = []
+        completed = []
+
+        def user(number):
+            rng = random.Random(args.seed * 1000003 + number)
+            client = Client(base_url, callbacks, samples, args.timeout)
+            for session in range(args.sessions):
+                # Memory runs alternate between two list sizes to measure the growth per author
+                authors = args.authors * (1 + (number + session) % 2) if args.memory else args.authors
+                if client.run_session(rng, authors, args.toggles):
+                    completed.append(number)
+
+        threads = [threading.Thread(target=user, args=(number,)) for number in range(args.users)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        report = summarize(samples, time.perf_counter() - start, len(completed))
+
+        over_budget = []
+        if args.memory:
+            connection = http.client.HTTPConnection(urllib.parse.urlsplit(base_url).hostname,
+                                                    urllib.parse.urlsplit(base_url).port or 80, timeout=args.timeout)
+            connection.request('GET', '/_memory-stats')
+            response = connection.getresponse()
+            if response.status != 200:
+                raise RuntimeError('memory statistics are not available, start the server with CREDIT_MEMORY_STATS=1')
+            report['memory'], over_budget = summarize_memory(json.loads(response.read()), args.memory_budget)
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    report['config'] = {key: value for key, value in vars(args).items() if key != 'output'}
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4)
+
+    if over_budget:
+        print(f'\nOver the memory budget of {args.memory_budget} KB per added author:')
+        for line in over_budget:
+            print(f'  {line}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
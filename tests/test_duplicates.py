@@ -0,0 +1,99 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.pop('CREDIT_BACKGROUND_JOBS', None)
+os.environ.pop('CREDIT_MEMORY_STATS', None)
+import app  # noqa: E402
+
+
+def authors(*names):
+    records = []
+    for role, name in enumerate(names, start=1):
+        parts = name.split()
+        records.append({'Role': role, 'First Name': parts[0], 'Middle Name': ' '.join(parts[1:-1]),
+                        'Last Name': parts[-1]})
+    return records
+
+
+def groups(*names):
+    return [[record['Role'] for record in group] for group in app.find_duplicates(authors(*names))]
+
+
+def test_accents_and_initials():
+    assert groups('Tomas Cajka', 'T. Cajka', 'Tomáš Čajka', 'Eva Hola') == [[1, 2, 3]]
+
+
+def test_middle_name_initial():
+    assert groups('Jan Rudl Novak', 'Jan R. Novak', 'Jan Novak') == [[1, 2, 3]]
+
+
+@pytest.mark.parametrize('a, b', [
+    ('Petr Novak', 'Petra Novak'),
+    ('Jan Novak', 'Jana Novak'),
+    ('Tomas Cajka', 'Tereza Cajka'),
+    ('Wei Zhang', 'Wei Zhao'),
+    ('Jan Novak', 'Jan Novakova'),
+])
+def test_different_authors(a, b):
+    assert groups(a, b) == []
+
+
+@pytest.mark.parametrize('a, b', [
+    ('Stanislava Hola', 'Stanislvaa Hola'),
+    ('Eva Brejchova', 'Eva Brejhcova'),
+    ('Eva Brejchova', 'Eva Wrejchova'),
+])
+def test_typos(a, b):
+    assert groups(a, b) == [[1, 2]]
+
+
+def test_namesakes_form_one_group():
+    names = ['Jan Novak'] * 150 + ['Eva Hola', 'Tomas Cajka', 'Tomas Cajka']
+
+    assert groups(*names) == [list(range(1, 151)), [152, 153]]
+
+
+def test_records_without_names_are_skipped():
+    records = authors('Eva Hola', 'Eva Hola') + [{'Role': 3, 'First Name': '', 'Middle Name': '', 'Last Name': ''},
+                                                 {'Role': 4, 'First Name': None, 'Last Name': None}]
+
+    assert [[record['Role'] for record in group] for group in app.find_duplicates(records)] == [[1, 2]]
+
+
+def test_format_is_capped():
+    names = [f'Jan Novak{chr(97 + i)}{chr(97 + j)}' for i in range(26) for j in range(26)][:30]
+    records = authors(*[name for name in names for _ in range(12)])
+    text = app.format_duplicates(app.find_duplicates(records))
+
+    assert text.startswith('Possible duplicate authors: Jan Novakaa (1), Jan Novakaa (2),')
+    assert text.count(' and 2 more') == app.duplicate_groups_shown
+    assert text.endswith(f'(and {30 - app.duplicate_groups_shown} more groups)')
+    assert app.format_duplicates([]) == ''
+
+
+def consortium(count):
+    # Distinct authors sharing a few common surnames, as in large consortium lists
+    surnames = ['Zhang', 'Zhao', 'Chen', 'Cheng', 'Wang', 'Wong', 'Li', 'Lee', 'Liu', 'Lin',
+                'Yang', 'Huang', 'Wu', 'Zhou', 'Xu', 'Sun', 'Ma', 'Zhu', 'Hu', 'Guo']
+    syllables = ['Wei', 'Jing', 'Min', 'Hui', 'Xiao', 'Yu', 'Li', 'Jun', 'Hong', 'Ying',
+                 'Lei', 'Fang', 'Tao', 'Bin', 'Chao', 'Hai', 'Ping', 'Qiang', 'Ming', 'Yan']
+    given = [a + b.lower() for a in syllables for b in syllables]
+    return authors(*[f'{given[i // len(surnames)]} {surnames[i % len(surnames)]}' for i in range(count)])
+
+
+def test_comparisons_grow_linearly(monkeypatch):
+    calls = []
+    given_names_match = app.given_names_match
+    monkeypatch.setattr(app, 'given_names_match', lambda a, b: calls.append(1) or given_names_match(a, b))
+
+    counts = []
+    for count in (2000, 4000):
+        calls.clear()
+        app.find_duplicates(consortium(count))
+        counts.append(len(calls))
+
+    # Quadratic blocking would compare about four times as many names
+    assert counts[1] <= 2.5 * counts[0]
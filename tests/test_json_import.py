@@ -0,0 +1,100 @@
+import base64
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.pop('CREDIT_BACKGROUND_JOBS', None)
+os.environ.pop('CREDIT_MEMORY_STATS', None)
+import app  # noqa: E402
+
+
+def upload(content, media_type='application/json'):
+    return f'data:{media_type};base64,' + base64.b64encode(content.encode()).decode()
+
+
+def test_role_names_with_dash_variants():
+    records = app.load_json_records([{'First Name': 'Eva', 'Last Name': 'Hola', 'Initials': 'EH',
+                                      'Writing — original draft': True, 'writing - review & editing': 1,
+                                      'Formal analysis': '', 'Software': 0}])
+
+    assert records[0]['Writing – original draft'] is True
+    assert records[0]['Writing – review & editing'] is True
+    assert records[0]['Formal Analysis'] is False
+    assert records[0]['Software'] is False
+    assert list(records[0]) == app.table_columns
+
+
+def test_manuscript_object():
+    records = app.load_json_records({'id': 'ms-1', 'authors': [{'First Name': 'Eva', 'Last Name': 'Hola'}]})
+
+    assert [record['Role'] for record in records] == [1]
+
+
+@pytest.mark.parametrize('authors, message', [
+    ([{'First Name': 'Eva', 'Last Name': 'Hola', 'Affiliation': 'IPHYS'}], 'unknown column "Affiliation"'),
+    ([{'First Name': 'Eva', 'Last Name': 'Hola', 'Software': 'yes'}], '"Software" must be true or false'),
+    ([{'First Name': 'Eva', 'Software': True}], 'missing column "Last Name"'),
+    ([{'First Name': ' ', 'Last Name': ''}], 'the name is empty'),
+    ([], 'the list of authors is empty'),
+    ({'id': 'ms-1', 'authors': []}, 'the list of authors is empty'),
+    (['Eva Hola'], 'author 1 is not an object'),
+    ('Eva Hola', 'expected a list of authors'),
+])
+def test_invalid_authors(authors, message):
+    with pytest.raises(ValueError, match=message):
+        app.load_json_records(authors)
+
+
+def test_blank_initials_are_generated():
+    records = app.load_json_records([{'First Name': 'Eva', 'Last Name': 'Hola', 'Writing — original draft': True},
+                                     {'First Name': 'Eva', 'Last Name': 'Hlavata', 'Initials': ''},
+                                     {'First Name': 'Jan', 'Last Name': 'Novak', 'Initials': 'EH'}])
+
+    assert [record['Initials'] for record in records] == ['EHo', 'EHl', 'EH']
+    assert app.generate_credit_text(records)[2] == 'CRediT: EHo: Writing – original draft'
+
+
+def test_json_upload():
+    content = json.dumps([{'First Name': 'Eva', 'Last Name': 'Hola', 'Initials': 'EH', 'Software': True}])
+    df = app.parse_contents(upload(content), 'authors.json')
+
+    assert list(df.columns) == app.table_columns
+    assert df.loc[0, 'Software'] == True  # noqa: E712
+
+
+def test_ndjson_upload_with_one_manuscript():
+    content = '\n' + json.dumps({'id': 'ms-1', 'authors': [{'First Name': 'Eva', 'Last Name': 'Hola'}]}) + '\n\n'
+    df = app.parse_contents(upload(content, 'application/x-ndjson'), 'authors.ndjson')
+
+    assert df.loc[0, 'Last Name'] == 'Hola'
+
+
+def test_ndjson_upload_with_several_manuscripts():
+    line = json.dumps([{'First Name': 'Eva', 'Last Name': 'Hola'}])
+    result = app.parse_contents(upload(f'{line}\n{line}\n', 'application/x-ndjson'), 'authors.ndjson')
+
+    assert isinstance(result, str)
+    assert 'contains 2 manuscripts' in result and '--batch' in result
+
+
+def test_batch_reports_errors_per_line(tmp_path):
+    source, target = tmp_path / 'manuscripts.ndjson', tmp_path / 'credit.ndjson'
+    source.write_text('\n'.join([
+        json.dumps({'id': 'ms-1', 'authors': [{'First Name': 'Eva', 'Last Name': 'Hola', 'Software': True}]}),
+        json.dumps({'id': 'ms-2', 'authors': []}),
+        json.dumps({'id': 'ms-3', 'authors': [{'First Name': 'Eva', 'Software': True}]}),
+        json.dumps({'id': 'ms-4', 'authors': [{'First Name': 'Tomas', 'Last Name': 'Cajka'},
+                                              {'First Name': 'T.', 'Last Name': 'Čajka'}]}),
+    ]), encoding='utf-8')
+
+    app.batch_process(source, target)
+    results = [json.loads(line) for line in target.read_text(encoding='utf-8').splitlines()]
+
+    assert [result['id'] for result in results] == ['ms-1', 'ms-2', 'ms-3', 'ms-4']
+    assert results[0]['credit_reversed_short'] == 'CRediT: EH: Software'
+    assert results[1]['error'] == 'the list of authors is empty'
+    assert results[2]['error'] == 'author 1: missing column "Last Name"'
+    assert results[3]['duplicates'] == 'Possible duplicate authors: Tomas Cajka (1), T. Čajka (2)'
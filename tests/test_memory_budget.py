@@ -0,0 +1,123 @@
+import base64
+import copy
+import functools
+import gc
+import json
+import os
+import random
+import statistics
+import sys
+import tracemalloc
+
+import pytest
+from dash._callback_context import context_value
+from dash._utils import AttributeDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Callbacks run in this process and tracemalloc is only started by the tests
+os.environ.pop('CREDIT_BACKGROUND_JOBS', None)
+os.environ.pop('CREDIT_MEMORY_STATS', None)
+import app  # noqa: E402
+
+# The peak of each call is compared between `authors` and twice as many authors, so fixed overhead cancels out
+authors = int(os.environ.get('CREDIT_MEMORY_AUTHORS', 200))
+# KB per added author for every case, about 1.5 times the measured growth, CREDIT_MEMORY_BUDGET_KB overrides them all
+budget_override = os.environ.get('CREDIT_MEMORY_BUDGET_KB')
+
+first_names = ['Jan', 'Petr', 'Tomas', 'Martin', 'Pavel', 'Jiri', 'Lukas', 'Ondrej', 'Michal', 'David',
+               'Eva', 'Jana', 'Lucie', 'Petra', 'Tereza', 'Katerina', 'Veronika', 'Michaela', 'Barbora', 'Klara']
+middle_names = ['', '', '', 'A', 'J', 'M']
+surnames = ['Novak', 'Svoboda', 'Dvorak', 'Cerny', 'Prochazka', 'Kucera', 'Vesely', 'Horak', 'Nemec', 'Pokorny',
+            'Marek', 'Pospisil', 'Hajek', 'Jelinek', 'Kral', 'Ruzicka', 'Benes', 'Fiala', 'Sedlacek', 'Dolezal',
+            'Zeman', 'Kolar', 'Navratil', 'Cermak', 'Vanek', 'Urban', 'Blaha', 'Kriz', 'Kovar', 'Bartos',
+            'Vlcek', 'Polak', 'Musil', 'Kopecky', 'Simek', 'Konecny', 'Maly', 'Holub', 'Stepanek', 'Kadlec']
+
+
+def author_list(count):
+    rng = random.Random(count)
+    pairs = rng.sample([(first, last) for first in first_names for last in surnames], count)
+    return ', '.join(' '.join(filter(None, [first, rng.choice(middle_names), last])) for first, last in pairs)
+
+
+@functools.lru_cache()
+def built_table(count):
+    # The table as read_list builds it, with a few roles ticked for every author
+    rng = random.Random(count)
+    data = app.read_list(1, author_list(count))[1]
+    for record in data:
+        for role in rng.sample(list(app.contributor_roles), 3):
+            record[role] = True
+    return data
+
+
+def table_data(count):
+    return copy.deepcopy(built_table(count))
+
+
+def json_upload(count):
+    records = [{col: record[col] for col in app.table_columns[1:]} for record in table_data(count)]
+    return 'data:application/json;base64,' + base64.b64encode(json.dumps(records).encode()).decode()
+
+
+def edit_inputs(count):
+    # The values of the text inputs and checkboxes of the table, as the browser sends them to the edit callback
+    data = table_data(count)
+    input_values = [record[col] for record in data for col in app.name_columns]
+    checkbox_values = [bool(record[role]) for record in data for role in app.contributor_roles]
+    return input_values, checkbox_values, data
+
+
+def triggered_by(prop_id, func):
+    # The edit callback reads what changed from the Dash callback context
+    def call(*args):
+        token = context_value.set(AttributeDict(triggered_inputs=[{'prop_id': prop_id, 'value': None}]))
+        try:
+            return func(*args)
+        finally:
+            context_value.reset(token)
+    return call
+
+
+toggle = json.dumps({'column': 'software', 'index': 0, 'type': 'input-checkbox'}, separators=(',', ':')) + '.value'
+
+
+def peak_kb(func, *args):
+    # The first call warms up imports and caches, the median of the next calls is the peak of the call itself
+    func(*args)
+    peaks = []
+    for _ in range(3):
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func(*args)
+            peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+        finally:
+            tracemalloc.stop()
+    return statistics.median(peaks)
+
+
+cases = {
+    'generate_credit_text': (1, lambda count: (app.generate_credit_text, table_data(count))),
+    'find_duplicates': (1, lambda count: (app.find_duplicates, table_data(count))),
+    'parse_contents': (3.5, lambda count: (app.parse_contents, json_upload(count), 'authors.json')),
+    'read list': (50, lambda count: (app.read_list, 1, author_list(count))),
+    'upload': (50, lambda count: (app.load_upload, json_upload(count), 'authors.json')),
+    'duplicates': (1, lambda count: (app.update_duplicates, app.author_names(table_data(count)))),
+    'add row': (50, lambda count: (triggered_by('add-row.n_clicks', app.edit_table), 1, *edit_inputs(count))),
+    'toggle role': (50, lambda count: (triggered_by(toggle, app.edit_table), 1, *edit_inputs(count))),
+    'generate text': (1, lambda count: (app.update_output, 1, table_data(count))),
+    'download xml': (7.5, lambda count: (app.export_xml, 1, table_data(count))),
+    'download json': (4.5, lambda count: (app.export_json, 1, table_data(count))),
+}
+
+
+@pytest.mark.parametrize('name', list(cases))
+def test_peak_per_author(name):
+    budget_kb, case = cases[name]
+    if budget_override:
+        budget_kb = float(budget_override)
+    func, *small = case(authors)
+    _, *large = case(2 * authors)
+
+    growth = (peak_kb(func, *large) - peak_kb(func, *small)) / authors
+    assert growth <= budget_kb, f'{name} peaks {growth:.2f} KB higher per added author, the budget is {budget_kb} KB'